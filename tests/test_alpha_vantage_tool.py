@@ -4,6 +4,7 @@ Unit tests for Alpha Vantage tool date formatting functionality.
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 from datetime import datetime
+import os
 import re
 
 
@@ -212,3 +213,190 @@ class TestAlphaVantageDateFormatting:
         assert "December 12, 2025" in result
         assert "$278.28" in result  # Other content preserved
 
+
+
+class TestAlphaVantagePayloadReduction:
+    """Test window selection, downsampling and single-pass date normalization."""
+    
+    DATE_PATTERN = re.compile(r'\b(?:(\d{4})-(\d{2})-(\d{2})|(\d{4})(\d{2})(\d{2})|(\d{1,2})/(\d{1,2})/(\d{4}))\b')
+    
+    def _match_date(self, match):
+        groups = match.groups()
+        if groups[0]:
+            year, month, day = groups[0:3]
+        elif groups[3]:
+            year, month, day = groups[3:6]
+        else:
+            month, day, year = groups[6:9]
+        try:
+            dt = datetime(int(year), int(month), int(day))
+        except ValueError:
+            return None
+        return dt if 1900 <= dt.year <= 2100 else None
+    
+    def _format_dates(self, text):
+        def replace_date(match):
+            dt = self._match_date(match)
+            return dt.strftime('%B %d, %Y') if dt else match.group(0)
+        
+        return self.DATE_PATTERN.sub(replace_date, text)
+    
+    def _to_iso_date(self, text):
+        match = self.DATE_PATTERN.fullmatch(text.strip())
+        dt = self._match_date(match) if match else None
+        return dt.strftime('%Y-%m-%d') if dt else None
+    
+    def _select_dates(self, dates, last_n=None, start_date=None, end_date=None, default_rows=10):
+        if last_n is not None and last_n < 1:
+            return f"Invalid last_n {last_n}: it must be at least 1."
+        bounds = []
+        for name, value in (("start_date", start_date), ("end_date", end_date)):
+            iso = self._to_iso_date(value) if value else None
+            if value and not iso:
+                return f"Invalid {name} '{value}': use YYYY-MM-DD."
+            bounds.append(iso)
+        start_date, end_date = bounds
+        dates = sorted(dates, reverse=True)
+        if start_date:
+            dates = [d for d in dates if d >= start_date]
+        if end_date:
+            dates = [d for d in dates if d <= end_date]
+        if last_n:
+            dates = dates[:last_n]
+        elif not (start_date or end_date):
+            dates = dates[:default_rows]
+        return dates
+    
+    def _downsample(self, rows, max_rows=30):
+        if len(rows) <= max_rows:
+            return rows
+        step = (len(rows) - 1) / (max_rows - 1)
+        return [rows[round(i * step)] for i in range(max_rows)]
+    
+    def test_single_pass_handles_all_formats(self):
+        """Test that one pattern converts ISO, compact and slash dates."""
+        text = "ISO 2025-12-12, compact 20251215, slash 12/15/2025"
+        result = self._format_dates(text)
+        assert result == "ISO December 12, 2025, compact December 15, 2025, slash December 15, 2025"
+    
+    def test_single_pass_preserves_invalid_dates(self):
+        """Test that invalid dates and out-of-range numbers are left untouched."""
+        assert self._format_dates("Date: 2025-13-45") == "Date: 2025-13-45"
+        assert self._format_dates("Volume: 12345678") == "Volume: 12345678"
+    
+    def test_last_n_returns_newest_rows(self):
+        """Test that last_n returns the most recent trading days."""
+        dates = ["2025-12-10", "2025-12-12", "2025-12-11"]
+        assert self._select_dates(dates, last_n=1) == ["2025-12-12"]
+        assert self._select_dates(dates, last_n=2) == ["2025-12-12", "2025-12-11"]
+    
+    def test_date_range_filter(self):
+        """Test filtering by start and end date."""
+        dates = ["2025-12-08", "2025-12-09", "2025-12-10", "2025-12-11", "2025-12-12"]
+        result = self._select_dates(dates, start_date="2025-12-09", end_date="2025-12-11")
+        assert result == ["2025-12-11", "2025-12-10", "2025-12-09"]
+    
+    @pytest.mark.parametrize("start_date, end_date", [
+        ("12/09/2025", "12/11/2025"),
+        ("20251209", "20251211"),
+        ("2025-12-09", "12/11/2025"),
+        (" 2025-12-09 ", "20251211"),
+    ])
+    def test_date_range_in_other_formats(self, start_date, end_date):
+        """Test that slash and compact window dates filter the same rows as ISO dates."""
+        dates = ["2025-12-08", "2025-12-09", "2025-12-10", "2025-12-11", "2025-12-12"]
+        result = self._select_dates(dates, start_date=start_date, end_date=end_date)
+        assert result == ["2025-12-11", "2025-12-10", "2025-12-09"]
+    
+    @pytest.mark.parametrize("start_date, end_date, name", [
+        ("last week", None, "start_date"),
+        ("2025-12-01", "2025-13-45", "end_date"),
+        ("Dec 1, 2025", None, "start_date"),
+        ("2025-12-01 to 2025-12-05", None, "start_date"),
+    ])
+    def test_unparseable_date_rejected(self, start_date, end_date, name):
+        """Test that dates in an unsupported format return an error instead of filtering."""
+        result = self._select_dates(["2025-12-12"], start_date=start_date, end_date=end_date)
+        assert result.startswith(f"Invalid {name}")
+    
+    @pytest.mark.parametrize("last_n", [0, -3])
+    def test_last_n_below_one_rejected(self, last_n):
+        """Test that last_n below 1 returns an error instead of the default window."""
+        dates = [f"2025-11-{day:02d}" for day in range(1, 31)]
+        assert self._select_dates(dates, last_n=last_n) == f"Invalid last_n {last_n}: it must be at least 1."
+    
+    def test_default_window(self):
+        """Test that a default number of rows is returned without a window."""
+        dates = [f"2025-11-{day:02d}" for day in range(1, 31)]
+        assert len(self._select_dates(dates)) == 10
+    
+    def test_downsample_keeps_endpoints(self):
+        """Test that downsampling keeps the first and last rows."""
+        rows = list(range(100))
+        result = self._downsample(rows)
+        assert len(result) == 30
+        assert result[0] == 0
+        assert result[-1] == 99
+        assert result == sorted(set(result))
+    
+    def test_downsample_short_range_unchanged(self):
+        """Test that short ranges are not downsampled."""
+        rows = list(range(5))
+        assert self._downsample(rows) == rows
+
+
+NOTEBOOK_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "multi_agent_system_financial_analysis.ipynb")
+
+
+def load_notebook_formatter():
+    """Build the notebook's own `_format_series` from its source, without the Alpha Vantage client."""
+    import ast
+    import json
+    with open(NOTEBOOK_PATH, encoding="utf-8") as f:
+        cells = json.load(f)["cells"]
+    source = next("".join(c["source"]) for c in cells if c["cell_type"] == "code" and "class AlphaVantageQueryRun" in "".join(c["source"]))
+    module = ast.parse(source)
+    constants = {"DEFAULT_ROWS", "MAX_ROWS", "PRICE_FIELDS", "_DATE_PATTERN"}
+    functions = {"_match_date", "_replace_date", "to_iso_date", "downsample"}
+    body = []
+    for node in module.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, "id", None) in constants for t in node.targets):
+            body.append(node)
+        elif isinstance(node, ast.FunctionDef) and node.name in functions:
+            body.append(node)
+        elif isinstance(node, ast.ClassDef) and node.name == "AlphaVantageQueryRun":
+            # Keep only the formatting methods; the rest needs the Alpha Vantage client
+            node.body = [m for m in node.body if isinstance(m, ast.FunctionDef) and m.name in ("_format_dates", "_format_series")]
+            node.name, node.bases, node.keywords, node.decorator_list = "Formatter", [], [], []
+            body.append(node)
+    namespace = {"re": re, "datetime": datetime}
+    exec(compile(ast.fix_missing_locations(ast.Module(body=body, type_ignores=[])), NOTEBOOK_PATH, "exec"), namespace)
+    return namespace["Formatter"]()
+
+
+class TestNotebookFormatSeries:
+    """Test the notebook's market-data table formatter itself."""
+
+    @pytest.fixture
+    def formatter(self):
+        return load_notebook_formatter()
+
+    def _data(self, volume):
+        return {"Time Series (Daily)": {
+            "2025-12-12": {"1. open": "99.00", "2. high": "101.00", "3. low": "98.00", "4. close": "100.00", "5. volume": volume},
+        }}
+
+    @pytest.mark.parametrize("volume", ["20150615", "19991231", "20251212"])
+    def test_eight_digit_volume_kept(self, formatter, volume):
+        """Test that 8-digit volumes are not mistaken for YYYYMMDD dates."""
+        table = formatter._format_series("AAPL", self._data(volume), last_n=1)
+        assert table.splitlines()[-1] == f"December 12, 2025|99.00|101.00|98.00|100.00|{volume}"
+
+    def test_window_in_slash_format(self, formatter):
+        """Test that the notebook converts window dates before filtering."""
+        table = formatter._format_series("AAPL", self._data("1000"), start_date="12/01/2025", end_date="20251231", fields=["close"])
+        assert table.splitlines()[1:] == ["date|close", "December 12, 2025|100.00"]
+
+    def test_invalid_last_n(self, formatter):
+        """Test that the notebook rejects last_n below 1."""
+        assert formatter._format_series("AAPL", self._data("1000"), last_n=0).startswith("Invalid last_n")
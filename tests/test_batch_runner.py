@@ -0,0 +1,229 @@
+"""
+Unit tests for the batch query runner (input parsing, result streaming and resume).
+"""
+import pytest
+import concurrent.futures
+import json
+import os
+from langchain_core.messages import AIMessage, HumanMessage
+
+
+def read_batch_queries(input_path):
+    queries = []
+    with open(input_path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            queries.append({"id": str(record.get("id", line_number)), "query": record["query"]})
+    return queries
+
+
+def read_completed_ids(output_path):
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == "ok":
+                completed.add(record["id"])
+    return completed
+
+
+class TestBatchInput:
+    """Test reading batch queries from JSONL."""
+
+    def test_ids_default_to_line_numbers(self, tmp_path):
+        """Test that records without an id get their line number."""
+        path = tmp_path / "queries.jsonl"
+        path.write_text(
+            json.dumps({"query": "Price of AAPL?"}) + "\n"
+            + "\n"
+            + json.dumps({"id": "tsla-news", "query": "Tesla news"}) + "\n"
+        )
+        queries = read_batch_queries(path)
+        assert queries == [
+            {"id": "1", "query": "Price of AAPL?"},
+            {"id": "tsla-news", "query": "Tesla news"},
+        ]
+
+
+class TestBatchResume:
+    """Test resuming a batch from its output file."""
+
+    def test_missing_output_file(self, tmp_path):
+        """Test that a fresh run has nothing completed."""
+        assert read_completed_ids(tmp_path / "results.jsonl") == set()
+
+    def test_only_successful_queries_skipped(self, tmp_path):
+        """Test that failed queries are retried and successful ones skipped."""
+        path = tmp_path / "results.jsonl"
+        path.write_text(
+            json.dumps({"id": "1", "status": "ok", "answer": "$278.28"}) + "\n"
+            + json.dumps({"id": "2", "status": "error", "error": "timeout"}) + "\n"
+        )
+        assert read_completed_ids(path) == {"1"}
+
+    def test_partial_line_after_crash(self, tmp_path):
+        """Test that a truncated last line from a crash is ignored."""
+        path = tmp_path / "results.jsonl"
+        path.write_text(json.dumps({"id": "1", "status": "ok"}) + "\n" + '{"id": "2", "sta')
+        assert read_completed_ids(path) == {"1"}
+
+    def test_resume_runs_remaining_queries(self, tmp_path):
+        """Test that a second run only processes queries missing from the output."""
+        output = tmp_path / "results.jsonl"
+        queries = [{"id": str(i), "query": f"q{i}"} for i in range(1, 6)]
+        processed = []
+
+        def run_batch_item(item):
+            processed.append(item["id"])
+            return {**item, "status": "ok", "answer": item["query"].upper()}
+
+        def run_batch(stop_after=None):
+            completed = read_completed_ids(output)
+            pending = [item for item in queries if item["id"] not in completed]
+            if stop_after is not None:
+                pending = pending[:stop_after]  # simulate a crash part-way through
+            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor, open(output, "a") as out:
+                for future in concurrent.futures.as_completed([executor.submit(run_batch_item, i) for i in pending]):
+                    out.write(json.dumps(future.result()) + "\n")
+                    out.flush()
+
+        run_batch(stop_after=2)
+        run_batch()
+
+        assert sorted(processed) == ["1", "2", "3", "4", "5"]
+        assert len(processed) == 5
+        assert read_completed_ids(output) == {"1", "2", "3", "4", "5"}
+
+
+def messages_since_request(messages):
+    last_request = max((i for i, msg in enumerate(messages) if isinstance(msg, HumanMessage)), default=-1)
+    return messages[last_request + 1:]
+
+
+class TestBatchItemIsolation:
+    """Test that each batch attempt runs on its own conversation."""
+
+    @pytest.fixture
+    def graph(self):
+        import operator
+        from typing import Annotated, Sequence
+        from typing_extensions import TypedDict
+        from langchain_core.messages import BaseMessage
+        from langgraph.checkpoint.memory import MemorySaver
+        from langgraph.graph import StateGraph, START, END
+
+        class AgentState(TypedDict):
+            messages: Annotated[Sequence[BaseMessage], operator.add]
+
+        def agent(state):
+            requests = [msg.content for msg in state["messages"] if isinstance(msg, HumanMessage)]
+            return {"messages": [AIMessage(content=" | ".join(requests), name="FinancialAgent")]}
+
+        workflow = StateGraph(AgentState)
+        workflow.add_node("FinancialAgent", agent)
+        workflow.add_edge(START, "FinancialAgent")
+        workflow.add_edge("FinancialAgent", END)
+        return workflow.compile(checkpointer=MemorySaver())
+
+    def run_batch_item(self, graph, item):
+        import uuid
+        thread_id = f"batch-{item['id']}-{uuid.uuid4().hex[:8]}"
+        final_state = graph.invoke(
+            {"messages": [HumanMessage(content=item["query"])]}, config={"configurable": {"thread_id": thread_id}}
+        )
+        agent_messages = [
+            msg for msg in messages_since_request(final_state["messages"]) if isinstance(msg, AIMessage) and msg.name
+        ]
+        return {**item, "thread_id": thread_id, "answer": agent_messages[-1].content, "agents": [m.name for m in agent_messages]}
+
+    def test_repeated_id_gets_fresh_thread(self, graph):
+        """Test that a query reusing an id from an earlier batch does not see the earlier conversation."""
+        first = self.run_batch_item(graph, {"id": "1", "query": "Price of AAPL?"})
+        second = self.run_batch_item(graph, {"id": "1", "query": "Tesla news"})
+        assert first["thread_id"] != second["thread_id"]
+        assert second["answer"] == "Tesla news"
+        assert second["agents"] == ["FinancialAgent"]
+
+    def test_messages_since_request(self):
+        """Test that only messages after the latest request belong to the run."""
+        messages = [
+            HumanMessage(content="Price of AAPL?"),
+            AIMessage(content="$278.28", name="FastLane"),
+            HumanMessage(content="Tesla news"),
+            AIMessage(content="Tesla shares rose.", name="WebSearchAgent"),
+        ]
+        assert [msg.name for msg in messages_since_request(messages)] == ["WebSearchAgent"]
+        assert messages_since_request([]) == []
+
+
+class TestBatchInterrupt:
+    """Test what a batch leaves behind when it stops part-way or finishes."""
+
+    def _run_batch(self, pending, run_batch_item, output, workers=2):
+        from langchain_core.caches import InMemoryCache
+        from langchain_core.globals import get_llm_cache, set_llm_cache
+
+        previous_llm_cache = get_llm_cache()
+        try:
+            if previous_llm_cache is None:
+                set_llm_cache(InMemoryCache())
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+            try:
+                with open(output, "a") as out:
+                    futures = [executor.submit(run_batch_item, item) for item in pending]
+                    for future in concurrent.futures.as_completed(futures):
+                        out.write(json.dumps(future.result()) + "\n")
+                        out.flush()
+            except BaseException:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+            executor.shutdown()
+        finally:
+            set_llm_cache(previous_llm_cache)
+
+    def test_queued_queries_cancelled_on_error(self, tmp_path):
+        """Test that an error stops the batch without running the queued queries."""
+        import threading
+        import time
+
+        output = tmp_path / "results.jsonl"
+        started = []
+        lock = threading.Lock()
+
+        def run_batch_item(item):
+            with lock:
+                started.append(item["id"])
+            if item["id"] == "1":
+                raise KeyboardInterrupt
+            time.sleep(0.05)
+            return {**item, "status": "ok"}
+
+        queries = [{"id": str(i), "query": f"q{i}"} for i in range(1, 41)]
+        with pytest.raises(KeyboardInterrupt):
+            self._run_batch(queries, run_batch_item, output)
+        time.sleep(0.2)
+        # Only the queries already running when the batch stopped were started
+        assert len(started) <= 4
+        assert read_completed_ids(output) <= set(started)
+
+    def test_llm_cache_restored(self, tmp_path):
+        """Test that the batch's LLM cache does not outlive the batch."""
+        from langchain_core.globals import get_llm_cache
+
+        assert get_llm_cache() is None
+        self._run_batch([{"id": "1", "query": "q1"}], lambda item: {**item, "status": "ok"}, tmp_path / "results.jsonl")
+        assert get_llm_cache() is None
+
+        def failing_item(item):
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            self._run_batch([{"id": "1", "query": "q1"}], failing_item, tmp_path / "results.jsonl")
+        assert get_llm_cache() is None
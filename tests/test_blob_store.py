@@ -0,0 +1,171 @@
+"""
+Unit tests for the content-addressed blob store used for large tool outputs.
+"""
+import pytest
+import hashlib
+import json
+import mmap
+import os
+import re
+
+
+class BlobStore:
+    """Copy of the notebook's blob store (without locking and statistics)."""
+
+    def __init__(self, root, threshold=6000, preview_chars=300):
+        self.root = root
+        self.threshold = threshold
+        self.preview_chars = preview_chars
+
+    def _path(self, blob_id):
+        return os.path.join(self.root, blob_id[:2], blob_id)
+
+    def put(self, text):
+        data = text.encode("utf-8")
+        blob_id = hashlib.sha256(data).hexdigest()[:16]
+        path = self._path(blob_id)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return blob_id
+
+    def read(self, blob_id, offset=0, length=None):
+        path = self._path(blob_id)
+        if not re.fullmatch(r"[0-9a-f]{16}", blob_id) or not os.path.exists(path):
+            raise KeyError(f"Unknown blob id: {blob_id}")
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return ""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                end = len(mapped) if length is None else min(len(mapped), 4 * (offset + length))
+                text = mapped[:end].decode("utf-8", errors="ignore")
+        return text[offset:] if length is None else text[offset:offset + length]
+
+    def offload(self, payload, label="output"):
+        text = payload if isinstance(payload, str) else json.dumps(payload, default=str, ensure_ascii=False)
+        if len(text) <= self.threshold:
+            return payload
+        blob_id = self.put(text)
+        return (
+            f"[blob:{blob_id} {label}, {len(text)} chars - use read_blob for more]\n"
+            f"{text[:self.preview_chars]}..."
+        )
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(str(tmp_path / "blobs"))
+
+
+class TestBlobStore:
+    """Test storing and reading blobs."""
+
+    def test_round_trip(self, store):
+        """Test that stored text reads back unchanged."""
+        text = "date|close\n" + "December 12, 2025|278.28\n" * 100
+        blob_id = store.put(text)
+        assert store.read(blob_id) == text
+
+    def test_content_addressed(self, store):
+        """Test that identical content is stored once under the same id."""
+        first = store.put("same payload")
+        second = store.put("same payload")
+        assert first == second
+        assert store.put("other payload") != first
+        files = [name for _, _, names in os.walk(store.root) for name in names]
+        assert len(files) == 2
+
+    def test_partial_read(self, store):
+        """Test reading a slice of a blob through mmap."""
+        blob_id = store.put("0123456789" * 10)
+        assert store.read(blob_id, offset=5, length=10) == "5678901234"
+        assert store.read(blob_id, offset=95, length=50) == "56789"
+
+    def test_partial_read_counts_characters(self, store):
+        """Test that offset and length count characters in non-ASCII text."""
+        text = "éé€𝄞abc" * 50
+        blob_id = store.put(text)
+        assert store.read(blob_id, 1, 4) == "é€𝄞a"
+        assert store.read(blob_id, 3, 3) == "𝄞ab"
+        pages = [store.read(blob_id, offset, 7) for offset in range(0, len(text), 7)]
+        assert "".join(pages) == text
+
+    def test_reference_size_matches_read_unit(self, store):
+        """Test that paging by the size in the reference reads the whole payload."""
+        text = "Umsatz über Erwartungen, ça monte — " * 300
+        reference = store.offload(text)
+        blob_id = re.search(r"\[blob:([0-9a-f]{16})", reference).group(1)
+        size = int(re.search(r"(\d+) chars", reference).group(1))
+        assert size == len(text)
+        assert store.read(blob_id, size - 10, 2000) == text[-10:]
+
+    def test_empty_blob(self, store):
+        """Test that an empty blob can be read."""
+        assert store.read(store.put("")) == ""
+
+    def test_unknown_or_invalid_id(self, store):
+        """Test that unknown ids and path-like ids are rejected."""
+        with pytest.raises(KeyError):
+            store.read("0123456789abcdef")
+        with pytest.raises(KeyError):
+            store.read("../../etc/passwd")
+
+
+class TestOffload:
+    """Test replacing large payloads with references."""
+
+    def test_small_payload_passes_through(self, store):
+        """Test that payloads under the threshold are returned unchanged."""
+        payload = {"query": "Tesla news", "results": []}
+        assert store.offload(payload) is payload
+        assert store.offload("short") == "short"
+
+    def test_large_payload_replaced_by_reference(self, store):
+        """Test that a large payload becomes a short reference with a preview."""
+        text = "out\n" * 2000
+        reference = store.offload(text, label="Python_REPL output")
+        assert reference.startswith("[blob:")
+        assert "Python_REPL output, 8000 chars" in reference
+        assert len(reference) < 400
+
+        blob_id = re.search(r"\[blob:([0-9a-f]{16})", reference).group(1)
+        assert store.read(blob_id) == text
+
+    def test_large_dict_serialized(self, store):
+        """Test that dict payloads are stored as JSON."""
+        payload = {"results": [{"content": "é" * 7000}]}
+        reference = store.offload(payload)
+        blob_id = re.search(r"\[blob:([0-9a-f]{16})", reference).group(1)
+        assert json.loads(store.read(blob_id)) == payload
+
+
+class TestThresholdAboveCappedOutputs:
+    """Test that outputs the tools already cap are not offloaded at the default threshold."""
+
+    def test_full_search_response_passes_through(self, store):
+        """Test that three results with capped snippets and long titles and URLs stay inline."""
+        snippet = ("Tesla shares rallied after deliveries beat estimates. " * 20)[:500] + "..."
+        payload = {
+            "query": "tesla stock news deliveries " * 3,
+            "results": [
+                {"title": "T" * 120, "url": "https://www.example.com/" + "a" * 130, "content": snippet}
+                for _ in range(3)
+            ],
+            "already_returned": ["https://www.example.com/" + "b" * 130] * 3,
+        }
+        assert store.offload(payload) is payload
+
+    def test_largest_market_data_table_passes_through(self, store):
+        """Test that a 30-row table with large prices and volumes stays inline."""
+        rows = ["BRK.A daily, 30 of 250 rows (downsampled)", "date|open|high|low|close|volume"]
+        rows += ["September 30, 2025|745123.4500|749999.9900|740000.0000|748250.1200|123456789"] * 30
+        table = "\n".join(rows)
+        assert store.offload(table) == table
+
+    def test_long_repl_output_offloaded(self, store):
+        """Test that unbounded REPL stdout is still offloaded."""
+        stdout = "row,value\n" + "2025-12-12,278.28\n" * 500
+        assert store.offload(stdout, label="Python_REPL output").startswith("[blob:")
@@ -0,0 +1,166 @@
+"""
+Unit tests for the direct-answer fast lane for templated price lookups.
+"""
+import pytest
+import re
+from langchain_core.messages import AIMessage, HumanMessage
+
+
+_COMPANY = r"(?P<company>\$?[\w.&' -]+?)"
+
+FAST_LANE_TEMPLATES = {
+    "last_close": [
+        rf"(?:what (?:was|is|'s) )?(?:the )?(?:last|latest|most recent|previous) (?:closing|close)(?: stock| share)? price (?:of|for) {_COMPANY}",
+        rf"(?:what (?:was|is|'s) )?{_COMPANY}(?:'s)? (?:last|latest|most recent|previous) (?:closing|close)(?: stock| share)? price",
+        rf"(?:what|where) did {_COMPANY} close(?: at)?(?: yesterday| last)?",
+    ],
+    "change": [
+        rf"(?:what (?:was|is|'s) )?(?:the )?(?:stock |share )?(?:price )?change (?:of|in|for) {_COMPANY} (?:over|in) the (?:last|past) (?P<days>\d+) (?:trading )?days",
+        rf"how (?:much )?(?:did|has) {_COMPANY} (?:move|moved|change|changed)(?: over| in)? the (?:last|past) (?P<days>\d+) (?:trading )?days",
+    ],
+    "range_52w": [
+        rf"(?:what (?:was|is|'s) )?(?:the )?52[- ]week (?P<extreme>high|low|range)(?: price)? (?:of|for) {_COMPANY}",
+        rf"(?:what (?:was|is|'s) )?{_COMPANY}(?:'s)? 52[- ]week (?P<extreme>high|low|range)",
+    ],
+}
+
+PATTERNS = [
+    (name, re.compile(pattern, re.IGNORECASE))
+    for name, patterns in FAST_LANE_TEMPLATES.items()
+    for pattern in patterns
+]
+
+FAST_LANE_TICKER = re.compile(r"\$([A-Za-z]{1,5}(?:\.[A-Za-z])?)|([A-Z]{1,5}(?:\.[A-Z])?)")
+
+COMPANY_NAMES = {"tesla": "TSLA", "bank of america": "BAC"}
+
+
+def resolve_fast_lane_ticker(company):
+    company = re.sub(r"(?:'s)?(?: (?:stock|shares|share price))+$", "", company.strip(), flags=re.IGNORECASE).strip()
+    match = FAST_LANE_TICKER.fullmatch(company)
+    if match:
+        return (match.group(1) or match.group(2)).upper()
+    return COMPANY_NAMES.get(company.lower())
+
+
+def match_template(text):
+    query = " ".join((text or "").split()).rstrip("?.! ")
+    for name, pattern in PATTERNS:
+        match = pattern.fullmatch(query)
+        if match:
+            return name, resolve_fast_lane_ticker(match.group("company")), match
+    return None
+
+
+def price(value):
+    return f"${float(value):,.2f}"
+
+
+DAILY = {f"2025-12-{day:02d}": {"4. close": str(270 + day)} for day in range(1, 13)}
+WEEKLY = {
+    f"2025-{month:02d}-01": {"2. high": str(200 + month * 5), "3. low": str(150 + month), "4. close": str(190 + month)}
+    for month in range(1, 13)
+}
+
+
+def answer_change(series, ticker, days):
+    dates = sorted(series, reverse=True)
+    if days < 1 or len(dates) <= days:
+        return None
+    end, start = float(series[dates[0]]["4. close"]), float(series[dates[days]]["4. close"])
+    sign = "+" if end >= start else "-"
+    return (
+        f"{ticker} moved {sign}{price(abs(end - start))} ({(end - start) / start:+.2%}) over the last {days} trading days, "
+        f"from {price(start)} on {dates[days]} to {price(end)} on {dates[0]}."
+    )
+
+
+def range_52w(series):
+    weeks = sorted(series, reverse=True)[:52]
+    high_week = max(weeks, key=lambda week: float(series[week]["2. high"]))
+    low_week = min(weeks, key=lambda week: float(series[week]["3. low"]))
+    return (high_week, series[high_week]["2. high"]), (low_week, series[low_week]["3. low"])
+
+
+def route_fast_lane(state):
+    last_message = state["messages"][-1]
+    return "answered" if isinstance(last_message, AIMessage) and last_message.name == "FastLane" else "continue"
+
+
+class TestTemplateMatching:
+    """Test matching requests against the fast-lane templates."""
+
+    @pytest.mark.parametrize("query, template, ticker", [
+        ("What was the last closing stock price of AAPL?", "last_close", "AAPL"),
+        ("what is the latest close price for $msft", "last_close", "MSFT"),
+        ("What did Tesla close at?", "last_close", "TSLA"),
+        ("Tesla's last closing price", "last_close", "TSLA"),
+        ("How much did MSFT move over the last 5 trading days?", "change", "MSFT"),
+        ("What was the price change of Bank of America over the past 10 days?", "change", "BAC"),
+        ("What is the 52-week high of NVDA?", "range_52w", "NVDA"),
+        ("TSLA 52-week range", "range_52w", "TSLA"),
+    ])
+    def test_matches(self, query, template, ticker):
+        """Test that templated requests match with the right ticker."""
+        name, resolved, _ = match_template(query)
+        assert name == template
+        assert resolved == ticker
+
+    def test_days_captured(self):
+        """Test that the window length is captured for change requests."""
+        _, _, match = match_template("How much did MSFT move over the last 5 trading days?")
+        assert match.group("days") == "5"
+
+    @pytest.mark.parametrize("query", [
+        "Summarize the latest news about Tesla's stock performance.",
+        "Draw a plot of the closing stock prices of AAPL over the last week",
+        "Why did AAPL close lower yesterday?",
+    ])
+    def test_other_requests_not_matched(self, query):
+        """Test that requests needing the agents do not match any template."""
+        assert match_template(query) is None
+
+    @pytest.mark.parametrize("query", [
+        "What was the last closing price of AAPL and MSFT?",
+        "What was the last closing price of Target?",
+        "What did apple close at?",
+    ])
+    def test_unresolved_company_falls_through(self, query):
+        """Test that several, ambiguous or unknown companies are not answered directly."""
+        result = match_template(query)
+        assert result is not None
+        assert result[1] is None
+
+
+class TestFastLaneAnswers:
+    """Test computing answers from market data."""
+
+    def test_change_over_days(self):
+        """Test the change between the latest close and the close N trading days earlier."""
+        answer = answer_change(DAILY, "MSFT", 5)
+        assert answer.startswith("MSFT moved +$5.00 (+1.81%) over the last 5 trading days")
+        assert "from $277.00 on 2025-12-07 to $282.00 on 2025-12-12" in answer
+
+    def test_change_longer_than_series(self):
+        """Test that windows longer than the cached series are left to the agents."""
+        assert answer_change(DAILY, "MSFT", 12) is None
+        assert answer_change(DAILY, "MSFT", 0) is None
+
+    def test_52_week_range(self):
+        """Test the 52-week high and low from the weekly series."""
+        (high_week, high), (low_week, low) = range_52w(WEEKLY)
+        assert (high_week, high) == ("2025-12-01", "260")
+        assert (low_week, low) == ("2025-01-01", "151")
+
+
+class TestFastLaneRouting:
+    """Test the graph routing after the fast lane."""
+
+    def test_answered(self):
+        """Test that a fast-lane answer ends the run."""
+        state = {"messages": [HumanMessage(content="What did AAPL close at?"), AIMessage(content="AAPL closed at $278.28.", name="FastLane")]}
+        assert route_fast_lane(state) == "answered"
+
+    def test_continue(self):
+        """Test that unanswered requests continue to the agents."""
+        assert route_fast_lane({"messages": [HumanMessage(content="Tesla news")]}) == "continue"
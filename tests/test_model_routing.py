@@ -0,0 +1,202 @@
+"""
+Unit tests for model routing, endpoint demotion and hedged requests.
+"""
+import pytest
+import concurrent.futures
+import time
+
+
+class ModelHealth:
+    """Copy of the notebook's per-model health tracker."""
+
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha
+        self.latency = None
+        self.calls = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.demoted_until = 0.0
+
+    def record_success(self, latency):
+        self.calls += 1
+        self.consecutive_errors = 0
+        self.latency = latency if self.latency is None else self.alpha * latency + (1 - self.alpha) * self.latency
+
+    def record_failure(self):
+        self.calls += 1
+        self.errors += 1
+        self.consecutive_errors += 1
+
+    def is_demoted(self):
+        return time.monotonic() < self.demoted_until
+
+
+class TestModelRouter:
+    """Test per-model latency/error tracking and candidate ordering."""
+
+    def _make_router(self, slow_threshold=1.0, max_consecutive_errors=3):
+        tiers = {"routing": ["small", "medium"], "analysis": ["large", "medium"]}
+        health = {name: ModelHealth() for models in tiers.values() for name in models}
+
+        def demote(h):
+            h.demoted_until = time.monotonic() + 60
+            h.consecutive_errors = 0
+            h.latency = None
+            h.calls = 0
+
+        def record_success(name, latency):
+            h = health[name]
+            h.record_success(latency)
+            if h.calls >= 3 and h.latency > slow_threshold:
+                demote(h)
+
+        def record_failure(name):
+            h = health[name]
+            h.record_failure()
+            if h.consecutive_errors >= max_consecutive_errors:
+                demote(h)
+
+        def candidates(tier):
+            models = tiers[tier]
+            return [n for n in models if not health[n].is_demoted()] + [n for n in models if health[n].is_demoted()]
+
+        return candidates, record_success, record_failure
+
+    def test_default_order(self):
+        """Test that healthy models keep their configured order."""
+        candidates, _, _ = self._make_router()
+        assert candidates("routing") == ["small", "medium"]
+        assert candidates("analysis") == ["large", "medium"]
+
+    def test_slow_model_demoted(self):
+        """Test that a consistently slow model moves to the back of its tier."""
+        candidates, record_success, _ = self._make_router(slow_threshold=1.0)
+        for _ in range(3):
+            record_success("large", 5.0)
+        assert candidates("analysis") == ["medium", "large"]
+
+    def test_single_slow_call_not_demoted(self):
+        """Test that one slow call is not enough to demote a model."""
+        candidates, record_success, _ = self._make_router(slow_threshold=2.0)
+        record_success("large", 0.2)
+        record_success("large", 0.2)
+        record_success("large", 3.0)
+        assert candidates("analysis") == ["large", "medium"]
+
+    def test_failing_model_demoted(self):
+        """Test that consecutive errors demote a model."""
+        candidates, _, record_failure = self._make_router(max_consecutive_errors=3)
+        for _ in range(3):
+            record_failure("small")
+        assert candidates("routing") == ["medium", "small"]
+
+    def test_success_resets_error_streak(self):
+        """Test that a success between errors resets the consecutive error count."""
+        candidates, record_success, record_failure = self._make_router(max_consecutive_errors=3)
+        record_failure("small")
+        record_failure("small")
+        record_success("small", 0.1)
+        record_failure("small")
+        assert candidates("routing") == ["small", "medium"]
+
+
+class TestHedgedCall:
+    """Test hedged duplicate requests."""
+
+    @pytest.fixture
+    def executor(self):
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+        yield pool
+        pool.shutdown(wait=False)
+
+    def _hedged_call(self, executor, call, names, hedge_delay):
+        remaining = list(names)
+        pending = set()
+        last_error = None
+
+        def launch():
+            pending.add(executor.submit(call, remaining.pop(0)))
+
+        launch()
+        while pending:
+            timeout = hedge_delay if remaining else None
+            done, _ = concurrent.futures.wait(pending, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+            if not done:
+                launch()
+                continue
+            for future in done:
+                pending.discard(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    last_error = e
+            if not pending and remaining:
+                launch()
+        raise last_error
+
+    def test_fast_primary_no_hedge(self, executor):
+        """Test that a fast primary answers without a hedged request."""
+        called = []
+
+        def call(name):
+            called.append(name)
+            return name
+
+        assert self._hedged_call(executor, call, ["primary", "backup"], hedge_delay=0.5) == "primary"
+        assert called == ["primary"]
+
+    def test_slow_primary_hedged(self, executor):
+        """Test that the backup answers first when the primary is slow."""
+        delays = {"primary": 0.5, "backup": 0.01}
+
+        def call(name):
+            time.sleep(delays[name])
+            return name
+
+        start = time.monotonic()
+        result = self._hedged_call(executor, call, ["primary", "backup"], hedge_delay=0.05)
+        assert result == "backup"
+        assert time.monotonic() - start < 0.4
+
+    def test_failed_primary_fails_over(self, executor):
+        """Test that a failing primary falls over to the backup immediately."""
+        def call(name):
+            if name == "primary":
+                raise RuntimeError("endpoint down")
+            return name
+
+        assert self._hedged_call(executor, call, ["primary", "backup"], hedge_delay=10) == "backup"
+
+    def test_all_models_fail(self, executor):
+        """Test that the last error is raised when every model fails."""
+        def call(name):
+            raise RuntimeError(f"{name} down")
+
+        with pytest.raises(RuntimeError, match="backup down"):
+            self._hedged_call(executor, call, ["primary", "backup"], hedge_delay=0.01)
+
+
+class TestTierModelSettings:
+    """Test the request settings of each tier's chat models."""
+
+    def _make_chat_model(self, model_name, max_tokens=2000, reasoning_effort=None):
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(
+            model=model_name,
+            base_url="https://openrouter.ai/api/v1",
+            api_key="test-key",
+            temperature=0,
+            max_tokens=max_tokens,
+            extra_body={"reasoning": {"effort": reasoning_effort}} if reasoning_effort else None,
+        )
+
+    def test_routing_requests_low_reasoning_effort(self):
+        """Test that the routing tier asks OpenRouter for short reasoning with room for the tool call."""
+        payload = self._make_chat_model("openai/gpt-oss-20b:free", 2000, "low")._get_request_payload([("user", "route")])
+        assert payload["extra_body"] == {"reasoning": {"effort": "low"}}
+        assert payload["max_completion_tokens"] == 2000
+
+    def test_default_reasoning_effort_not_sent(self):
+        """Test that tiers without a reasoning effort use the provider default."""
+        payload = self._make_chat_model("openai/gpt-oss-120b:free", 2000, "")._get_request_payload([("user", "analyze")])
+        assert "reasoning" not in (payload.get("extra_body") or {})
@@ -0,0 +1,293 @@
+"""
+Unit tests for speculative market-data prefetch and the shared market-data cache.
+"""
+import pytest
+import concurrent.futures
+import csv
+import os
+import re
+import threading
+import time
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+TICKER_STOPWORDS = {
+    "AI", "API", "CEO", "CFO", "CTO", "EPS", "ETF", "GDP", "IPO", "NYSE", "NASDAQ", "SEC",
+    "USA", "US", "USD", "EUR", "PE", "ROI", "YTD", "OK", "PDF", "CSV", "FAQ", "ESG",
+    "TL", "DR", "IMO", "IMHO", "FYI", "BTW", "ETA", "ATH", "RSI", "MACD", "EMA", "SMA", "VWAP",
+    "YOY", "QOQ", "EBIT", "FCF", "DCF", "ROE", "ROA", "ROIC", "CAGR", "NAV", "AUM", "FOMC", "CPI",
+    "PPI", "FED", "ECB", "OPEC", "GAAP", "TTM", "EOD", "OTC", "IRA", "LLM", "CAPEX", "OPEX",
+}
+
+FULL_LISTING_MIN_ROWS = 5000
+
+TICKER_PATTERN = re.compile(r"\$([A-Za-z]{1,5}(?:\.[A-Za-z])?)\b|\b([A-Z]{2,5}(?:\.[A-Z])?)\b")
+
+NAME_SUFFIXES = {
+    "inc", "incorporated", "corp", "corporation", "co", "company", "companies", "ltd", "limited",
+    "plc", "sa", "se", "nv", "ag", "as", "class", "a", "b", "c", "and", "the", "com",
+}
+
+AMBIGUOUS_NAMES = {
+    "target", "block", "square", "snap", "delta", "visa", "oracle", "intuit",
+    "chase", "zoom", "micron", "southern", "meta", "sap", "novo",
+}
+
+
+def normalize_name(text):
+    text = re.sub(r"['’]s\b", "", text.lower()).replace("&", " and ")
+    tokens = re.findall(r"[a-z0-9]+", text)
+    while tokens and tokens[-1] in NAME_SUFFIXES:
+        tokens.pop()
+    while tokens and tokens[0] == "the":
+        tokens.pop(0)
+    return " ".join(tokens)
+
+
+def load_index():
+    names, listed = {}, set()
+    with open(os.path.join(DATA_DIR, "listing_status.csv"), newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            listed.add(row["symbol"])
+            names.setdefault(normalize_name(row["name"]), []).append(row["symbol"])
+    with open(os.path.join(DATA_DIR, "symbol_aliases.csv"), newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            names.setdefault(normalize_name(row["alias"]), []).append(row["symbol"])
+    return names, listed
+
+
+NAMES, LISTED = load_index()
+
+
+def is_listed(symbol, listings=LISTED):
+    symbol = symbol.strip().upper()
+    return symbol in listings or symbol.replace(".", "-") in listings
+
+
+def find_in_text(text, max_words=4):
+    tokens = normalize_name(text).split()
+    found = []
+    i = 0
+    while i < len(tokens):
+        for size in range(min(max_words, len(tokens) - i), 0, -1):
+            phrase = " ".join(tokens[i:i + size])
+            if phrase in NAMES and phrase not in AMBIGUOUS_NAMES:
+                found.extend(symbol for symbol in NAMES[phrase] if symbol not in found)
+                i += size
+                break
+        else:
+            i += 1
+    return found
+
+
+def extract_candidate_tickers(text, limit=2, listings=LISTED):
+    complete = len(listings) >= FULL_LISTING_MIN_ROWS
+    candidates = []
+    for match in TICKER_PATTERN.finditer(text or ""):
+        cashtag, word = match.groups()
+        symbol = (cashtag or word).upper()
+        if word:
+            if not is_listed(symbol, listings) and (complete or symbol in TICKER_STOPWORDS):
+                continue
+        if symbol not in candidates:
+            candidates.append(symbol)
+    candidates.extend(symbol for symbol in find_in_text(text or "") if symbol not in candidates)
+    return candidates[:limit]
+
+
+class TestTickerExtraction:
+    """Test local extraction of candidate tickers from user requests."""
+
+    def test_extract_plain_ticker(self):
+        """Test extraction of an all-caps ticker."""
+        assert extract_candidate_tickers("What was the last closing stock price of AAPL?") == ["AAPL"]
+
+    def test_extract_cashtag(self):
+        """Test extraction of a lowercase cashtag."""
+        assert extract_candidate_tickers("How is $tsla doing?") == ["TSLA"]
+
+    def test_skip_acronyms(self):
+        """Test that common finance acronyms are not treated as tickers."""
+        assert extract_candidate_tickers("Who is the CEO and what is the EPS of NVDA?") == ["NVDA"]
+
+    def test_limit_and_dedupe(self):
+        """Test that candidates are deduplicated and limited."""
+        result = extract_candidate_tickers("Compare AAPL, AAPL, MSFT and GOOGL")
+        assert result == ["AAPL", "MSFT"]
+
+    def test_no_tickers(self):
+        """Test a request that names no ticker."""
+        assert extract_candidate_tickers("Summarize the latest news about the stock market.") == []
+
+    def test_company_name(self):
+        """Test that company names resolve through the symbol index."""
+        assert extract_candidate_tickers("Summarize the latest news about Tesla's stock performance.") == ["TSLA"]
+
+    @pytest.mark.parametrize("query, tickers", [
+        ("Should I chase the rally in NVDA?", ["NVDA"]),
+        ("Zoom in on MSFT's Q3 results", ["MSFT"]),
+        ("Is Micron a buy for southern investors?", []),
+        ("Any meta analysis of momentum in Target stocks?", []),
+    ])
+    def test_common_words_not_matched_as_names(self, query, tickers):
+        """Test that names that are also common words do not produce candidates."""
+        assert extract_candidate_tickers(query) == tickers
+
+    def test_explicit_symbols_before_names(self):
+        """Test that written-out symbols are kept ahead of company names when over the limit."""
+        assert extract_candidate_tickers("Compare Tesla and Apple with $nvda and AMD") == ["NVDA", "AMD"]
+        assert extract_candidate_tickers("Compare Tesla with $nvda") == ["NVDA", "TSLA"]
+
+    @pytest.mark.parametrize("query, tickers", [
+        ("TL;DR on NVDA earnings?", ["NVDA"]),
+        ("IMO the market is overheated", []),
+        ("What is the RSI of TSLA?", ["TSLA"]),
+        ("FYI, how did AMD do this week?", ["AMD"]),
+    ])
+    def test_abbreviations_not_prefetched(self, query, tickers):
+        """Test that abbreviations are skipped with both the bundled subset and a full listing."""
+        full_listing = LISTED | {f"X{i:04d}" for i in range(FULL_LISTING_MIN_ROWS)}
+        assert extract_candidate_tickers(query) == tickers
+        assert extract_candidate_tickers(query, listings=full_listing) == tickers
+
+    def test_unlisted_ticker_with_bundled_subset(self):
+        """Test that tickers missing from the bundled subset are still taken."""
+        assert len(LISTED) < FULL_LISTING_MIN_ROWS
+        assert not is_listed("ROKU")
+        assert extract_candidate_tickers("What is the price of ROKU?") == ["ROKU"]
+        assert extract_candidate_tickers("Is $hood worth it?") == ["HOOD"]
+
+    def test_full_listing_requires_listed_symbol(self):
+        """Test that with a full listing only listed all-caps words and cashtags are taken."""
+        full_listing = LISTED | {"ROKU"} | {f"X{i:04d}" for i in range(FULL_LISTING_MIN_ROWS)}
+        assert extract_candidate_tickers("What is the price of ROKU?", listings=full_listing) == ["ROKU"]
+        assert extract_candidate_tickers("Is HOOD worth it?", listings=full_listing) == []
+        assert extract_candidate_tickers("Is $hood worth it?", listings=full_listing) == ["HOOD"]
+        assert extract_candidate_tickers("The XYZW thesis for NVDA", listings=full_listing) == ["NVDA"]
+
+    def test_class_suffix_listed(self):
+        """Test that share classes match the listing with either separator."""
+        assert extract_candidate_tickers("Price of BRK.B?") == ["BRK.B"]
+
+    def test_stopwords_without_listing(self):
+        """Test that only stopwords are skipped when the symbol listing is missing."""
+        assert extract_candidate_tickers("What is the EPS of HOOD?", listings=set()) == ["HOOD"]
+
+    def test_word_like_aliases_are_ambiguous(self):
+        """Test that bundled names that are common words are listed as ambiguous."""
+        for word in ("chase", "zoom", "micron", "southern"):
+            assert word in NAMES
+            assert word in AMBIGUOUS_NAMES
+
+
+class TestPrefetchCoalescing:
+    """Test that a tool call during a prefetch reuses the in-flight fetch."""
+
+    def test_tool_call_waits_for_prefetch(self):
+        """Test that only one fetch is made when the tool call overlaps a prefetch."""
+        inflight = {}
+        entries = {}
+        lock = threading.Lock()
+        calls = []
+
+        def fetch(ticker):
+            calls.append(ticker)
+            time.sleep(0.1)
+            return {"Time Series (Daily)": {"2025-12-12": {"4. close": "278.28"}}}
+
+        def load(key, future):
+            data = fetch(key)
+            with lock:
+                inflight.pop(key, None)
+                entries[key] = data
+            future.set_result(data)
+
+        def prefetch(key, executor):
+            with lock:
+                if key in entries or key in inflight:
+                    return False
+                future = inflight[key] = concurrent.futures.Future()
+            executor.submit(load, key, future)
+            return True
+
+        def get_or_fetch(key):
+            with lock:
+                if key in entries:
+                    return entries[key]
+                future = inflight.get(key)
+                is_owner = future is None
+                if is_owner:
+                    future = inflight[key] = concurrent.futures.Future()
+            if is_owner:
+                load(key, future)
+            return future.result()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            assert prefetch("AAPL", executor)
+            assert not prefetch("AAPL", executor)  # already in flight
+            data = get_or_fetch("AAPL")
+
+        assert data["Time Series (Daily)"]["2025-12-12"]["4. close"] == "278.28"
+        assert calls == ["AAPL"]
+
+    def test_prefetch_stats(self):
+        """Test hit and waste ratios."""
+        def prefetch_stats(issued, hits):
+            return {
+                "issued": issued,
+                "hits": hits,
+                "wasted": issued - hits,
+                "hit_ratio": round(hits / issued, 3) if issued else None,
+                "waste_ratio": round((issued - hits) / issued, 3) if issued else None,
+            }
+
+        stats = prefetch_stats(4, 3)
+        assert stats["wasted"] == 1
+        assert stats["hit_ratio"] == 0.75
+        assert stats["waste_ratio"] == 0.25
+        assert prefetch_stats(0, 0)["hit_ratio"] is None
+
+
+class TestFetchTimeout:
+    """Test that a market-data fetch never keeps the caller past its timeout."""
+
+    def _cache(self, executor):
+        inflight, entries, lock = {}, {}, threading.Lock()
+
+        def load(key, fetch, future):
+            data = fetch(key)
+            with lock:
+                inflight.pop(key, None)
+                entries[key] = data
+            future.set_result(data)
+
+        def get_or_fetch(key, fetch, timeout):
+            with lock:
+                if key in entries:
+                    return entries[key]
+                future = inflight.get(key)
+                if future is None:
+                    future = inflight[key] = concurrent.futures.Future()
+                    executor.submit(load, key, fetch, future)
+            try:
+                return future.result(timeout=timeout)
+            except concurrent.futures.TimeoutError:
+                raise TimeoutError(f"No market data for {key} within {timeout:.0f}s.") from None
+
+        return get_or_fetch
+
+    def test_owner_fetch_bounded(self):
+        """Test that the calling thread stops waiting on a slow fetch it started itself."""
+        def slow_fetch(key):
+            time.sleep(0.3)
+            return {"Time Series (Daily)": {}}
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            get_or_fetch = self._cache(executor)
+            start = time.monotonic()
+            with pytest.raises(TimeoutError, match="No market data for ROKU"):
+                get_or_fetch("ROKU", slow_fetch, timeout=0.05)
+            assert time.monotonic() - start < 0.2
+            # The fetch finishes in the background and serves the next call
+            assert get_or_fetch("ROKU", slow_fetch, timeout=1) == {"Time Series (Daily)": {}}
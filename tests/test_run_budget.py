@@ -0,0 +1,382 @@
+"""
+Unit tests for run deadlines and token budgets.
+"""
+import pytest
+import collections
+import concurrent.futures
+import contextvars
+import functools
+import threading
+import time
+import uuid
+from langchain_core.messages import AIMessage, HumanMessage
+
+
+LOW_BUDGET_SECONDS = 20
+LOW_BUDGET_TOKENS = 5000
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class RunBudget:
+    """Copy of the notebook's run budget."""
+
+    def __init__(self, deadline=None, token_budget=None, tokens_used=0):
+        self.deadline = deadline
+        self.token_budget = token_budget
+        self.tokens_used = tokens_used
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(state.get("deadline"), state.get("token_budget"), state.get("tokens_used") or 0)
+
+    def remaining_seconds(self):
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.time())
+
+    def remaining_tokens(self):
+        if self.token_budget is None:
+            return None
+        return max(0, self.token_budget - self.tokens_used)
+
+    def cap_timeout(self, timeout):
+        remaining = self.remaining_seconds()
+        if remaining is None:
+            return timeout
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def record_usage(self, message):
+        usage = getattr(message, "usage_metadata", None) or {}
+        tokens = usage.get("total_tokens", 0)
+        with self._lock:
+            self.tokens_used += tokens
+
+    def exhausted_reason(self):
+        if self.remaining_seconds() == 0:
+            return "deadline reached"
+        if self.remaining_tokens() == 0:
+            return "token budget spent"
+        return None
+
+    def is_low(self):
+        seconds, tokens = self.remaining_seconds(), self.remaining_tokens()
+        return (seconds is not None and seconds < LOW_BUDGET_SECONDS) or (tokens is not None and tokens < LOW_BUDGET_TOKENS)
+
+
+current_budget = contextvars.ContextVar("current_budget", default=None)
+
+MAX_TRACKED_RUNS = 1024
+_run_budgets = collections.OrderedDict()
+_run_budgets_lock = threading.Lock()
+
+
+def budget_for_run(state):
+    run_id = state.get("run_id")
+    if not run_id:
+        return RunBudget.from_state(state)
+    with _run_budgets_lock:
+        budget = _run_budgets.get(run_id)
+        if budget is None:
+            budget = _run_budgets[run_id] = RunBudget.from_state(state)
+            while len(_run_budgets) > MAX_TRACKED_RUNS:
+                _run_budgets.popitem(last=False)
+        return budget
+
+
+def run_tokens_used(state):
+    with _run_budgets_lock:
+        budget = _run_budgets.get(state.get("run_id"))
+    return budget.tokens_used if budget is not None else state.get("tokens_used", 0)
+
+
+def with_budget(node):
+    @functools.wraps(node)
+    def wrapper(state, *args, **kwargs):
+        budget = budget_for_run(state)
+        token = current_budget.set(budget)
+        try:
+            update = node(state, *args, **kwargs)
+        finally:
+            current_budget.reset(token)
+        if budget.tokens_used != (state.get("tokens_used") or 0):
+            update = {**(update or {}), "tokens_used": budget.tokens_used}
+        return update
+    return wrapper
+
+
+def finish_within_budget(messages, reason):
+    last_request = max((i for i, msg in enumerate(messages) if isinstance(msg, HumanMessage)), default=-1)
+    answers = [
+        msg for msg in messages[last_request + 1:]
+        if isinstance(msg, AIMessage) and msg.name and msg.name != "Supervisor" and "encountered an error" not in msg.content
+    ]
+    if answers:
+        content = f"Stopped early ({reason}). Best answer so far, from {answers[-1].name}:\n\n{answers[-1].content}"
+    else:
+        content = f"Stopped early ({reason}) before any agent could answer. Try again with a larger budget."
+    return {"next": "FINISH", "stop_reason": reason, "messages": [AIMessage(content=content, name="Supervisor")]}
+
+
+def usage(total_tokens):
+    return {"input_tokens": total_tokens - 10, "output_tokens": 10, "total_tokens": total_tokens}
+
+
+class TestRunBudget:
+    """Test remaining time and token accounting."""
+
+    def test_no_limits(self):
+        """Test that a run without a budget is never exhausted or low."""
+        budget = RunBudget()
+        assert budget.remaining_seconds() is None
+        assert budget.cap_timeout(5) == 5
+        assert budget.cap_timeout(None) is None
+        assert budget.exhausted_reason() is None
+        assert not budget.is_low()
+
+    def test_cap_timeout(self):
+        """Test that timeouts are cut down to the time left."""
+        budget = RunBudget(deadline=time.time() + 2)
+        assert budget.cap_timeout(5) <= 2
+        assert budget.cap_timeout(0.5) == 0.5
+        assert 0 < budget.cap_timeout(None) <= 2
+
+    def test_deadline_reached(self):
+        """Test that a past deadline exhausts the budget."""
+        budget = RunBudget(deadline=time.time() - 1)
+        assert budget.remaining_seconds() == 0
+        assert budget.exhausted_reason() == "deadline reached"
+
+    def test_token_budget(self):
+        """Test that recorded usage counts against the token budget."""
+        budget = RunBudget(token_budget=10000, tokens_used=4000)
+        budget.record_usage(AIMessage(content="", usage_metadata=usage(2000)))
+        assert budget.remaining_tokens() == 4000
+        assert budget.is_low()
+        budget.record_usage(AIMessage(content="", usage_metadata=usage(5000)))
+        assert budget.remaining_tokens() == 0
+        assert budget.exhausted_reason() == "token budget spent"
+
+    def test_missing_usage_metadata(self):
+        """Test that responses without usage metadata count as zero tokens."""
+        budget = RunBudget(token_budget=100)
+        budget.record_usage(AIMessage(content="FINISH"))
+        assert budget.tokens_used == 0
+
+
+class TestWithBudget:
+    """Test running graph nodes with the run's budget."""
+
+    def test_tokens_used_reported_in_update(self):
+        """Test that tokens used by a node are added to its state update."""
+        @with_budget
+        def node(state, name):
+            current_budget.get().record_usage(AIMessage(content="", usage_metadata=usage(300)))
+            return {"messages": [AIMessage(content="done", name=name)]}
+
+        update = node({"messages": [], "token_budget": 1000, "tokens_used": 200}, name="FinancialAgent")
+        assert update["tokens_used"] == 500
+        assert current_budget.get() is None
+
+    def test_no_update_without_usage(self):
+        """Test that nodes making no model calls leave tokens_used alone."""
+        node = with_budget(lambda state: {"next": "FINISH"})
+        assert node({"messages": []}) == {"next": "FINISH"}
+
+    def test_budget_visible_in_worker_threads(self):
+        """Test that tools and models running in other threads share the node's budget."""
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+
+        @with_budget
+        def node(state):
+            def model_call():
+                current_budget.get().record_usage(AIMessage(content="", usage_metadata=usage(100)))
+            futures = [executor.submit(contextvars.copy_context().run, model_call) for _ in range(2)]
+            concurrent.futures.wait(futures)
+            return {}
+
+        assert node({"token_budget": 1000})["tokens_used"] == 200
+        executor.shutdown()
+
+
+class TestFinishWithinBudget:
+    """Test the best-effort answer when a run stops early."""
+
+    def test_uses_last_answer_for_current_request(self):
+        """Test that the latest successful agent answer is kept."""
+        messages = [
+            HumanMessage(content="Price of AAPL?"),
+            AIMessage(content="The last close was $278.28.", name="FinancialAgent"),
+            AIMessage(content="WebSearchAgent encountered an error: timeout", name="WebSearchAgent"),
+        ]
+        update = finish_within_budget(messages, "deadline reached")
+        assert update["next"] == "FINISH"
+        assert update["stop_reason"] == "deadline reached"
+        assert "$278.28" in update["messages"][0].content
+        assert "FinancialAgent" in update["messages"][0].content
+
+    def test_ignores_answers_to_earlier_requests(self):
+        """Test that answers from a previous run on the same thread are not reused."""
+        messages = [
+            HumanMessage(content="Price of AAPL?"),
+            AIMessage(content="The last close was $278.28.", name="FinancialAgent"),
+            HumanMessage(content="Price of MSFT?"),
+        ]
+        update = finish_within_budget(messages, "token budget spent")
+        assert "$278.28" not in update["messages"][0].content
+        assert "before any agent could answer" in update["messages"][0].content
+
+
+def start_run_node(state, config):
+    configurable = (config or {}).get("configurable", {})
+    return {
+        "run_id": uuid.uuid4().hex,
+        "deadline": configurable.get("deadline"),
+        "token_budget": configurable.get("token_budget"),
+        "tokens_used": 0,
+        "started_at": time.time(),
+        "stop_reason": None,
+    }
+
+
+class TestBudgetPerInvocation:
+    """Test that a budget applies to one invocation, not to the whole thread."""
+
+    @pytest.fixture
+    def graph(self):
+        import operator
+        from typing import Annotated, Optional, Sequence
+        from typing_extensions import TypedDict
+        from langchain_core.messages import BaseMessage
+        from langgraph.checkpoint.memory import MemorySaver
+        from langgraph.graph import StateGraph, START, END
+
+        class AgentState(TypedDict):
+            messages: Annotated[Sequence[BaseMessage], operator.add]
+            next: str
+            run_id: str
+            deadline: Optional[float]
+            token_budget: Optional[int]
+            tokens_used: int
+            started_at: float
+            stop_reason: Optional[str]
+
+        @with_budget
+        def supervisor(state):
+            budget = current_budget.get()
+            if budget.exhausted_reason():
+                return finish_within_budget(state["messages"], budget.exhausted_reason())
+            budget.record_usage(AIMessage(content="", usage_metadata=usage(100)))
+            return {"next": "FINISH", "messages": [AIMessage(content="answer", name="FinancialAgent")]}
+
+        workflow = StateGraph(AgentState)
+        workflow.add_node("StartRun", start_run_node)
+        workflow.add_node("Supervisor", supervisor)
+        workflow.add_edge(START, "StartRun")
+        workflow.add_edge("StartRun", "Supervisor")
+        workflow.add_edge("Supervisor", END)
+        return workflow.compile(checkpointer=MemorySaver())
+
+    def test_expired_budget_does_not_carry_over(self, graph):
+        """Test that a follow-up turn without a budget is not stopped by the previous turn's deadline."""
+        first = graph.invoke(
+            {"messages": [HumanMessage(content="Price of AAPL?")]},
+            config={"configurable": {"thread_id": "t1", "deadline": time.time() - 1, "token_budget": 1000}},
+        )
+        assert first["stop_reason"] == "deadline reached"
+
+        second = graph.invoke(
+            {"messages": [HumanMessage(content="And MSFT?")]},
+            config={"configurable": {"thread_id": "t1"}},
+        )
+        assert second["stop_reason"] is None
+        assert second["deadline"] is None
+        assert second["messages"][-1].content == "answer"
+        assert second["tokens_used"] == 100
+
+    def test_tokens_counted_per_run(self, graph):
+        """Test that token usage starts from zero on every turn."""
+        config = {"configurable": {"thread_id": "t2", "token_budget": 150}}
+        assert graph.invoke({"messages": [HumanMessage(content="Price of AAPL?")]}, config=config)["tokens_used"] == 100
+        second = graph.invoke({"messages": [HumanMessage(content="And MSFT?")]}, config=config)
+        assert second["tokens_used"] == 100
+        assert second["stop_reason"] is None
+
+
+class TestLateHedgedDuplicates:
+    """Test that model calls finishing after their node has returned are still counted."""
+
+    @pytest.fixture
+    def graph(self):
+        import operator
+        from typing import Annotated, Optional, Sequence
+        from typing_extensions import TypedDict
+        from langchain_core.messages import BaseMessage
+        from langgraph.graph import StateGraph, START, END
+
+        class AgentState(TypedDict):
+            messages: Annotated[Sequence[BaseMessage], operator.add]
+            run_id: str
+            deadline: Optional[float]
+            token_budget: Optional[int]
+            tokens_used: int
+            started_at: float
+            stop_reason: Optional[str]
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+
+        def model_call(delay):
+            time.sleep(delay)
+            current_budget.get().record_usage(AIMessage(content="", usage_metadata=usage(15)))
+            return delay
+
+        @with_budget
+        def agent(state):
+            # Hedged pair: the hedge answers after 0.1s, the slow primary finishes at 0.5s
+            primary = executor.submit(contextvars.copy_context().run, model_call, 0.5)
+            hedge = executor.submit(contextvars.copy_context().run, model_call, 0.1)
+            concurrent.futures.wait([primary, hedge], return_when=concurrent.futures.FIRST_COMPLETED)
+            return {"messages": [AIMessage(content="answer", name="FinancialAgent")]}
+
+        @with_budget
+        def supervisor(state):
+            time.sleep(0.6)
+            return {}
+
+        workflow = StateGraph(AgentState)
+        workflow.add_node("StartRun", start_run_node)
+        workflow.add_node("Agent", agent)
+        workflow.add_node("Supervisor", supervisor)
+        workflow.add_edge(START, "StartRun")
+        workflow.add_edge("StartRun", "Agent")
+        workflow.add_edge("Agent", "Supervisor")
+        workflow.add_edge("Supervisor", END)
+        yield workflow.compile()
+        executor.shutdown()
+
+    def test_duplicate_counted_by_next_node(self, graph):
+        """Test that the slow primary's tokens reach the state through the next node."""
+        final_state = graph.invoke({"messages": [HumanMessage(content="Price of AAPL?")]}, config={"configurable": {"token_budget": 1000}})
+        assert final_state["tokens_used"] == 30
+        assert run_tokens_used(final_state) == 30
+
+    def test_duplicate_after_last_node(self):
+        """Test that a call completing after the run's last node still counts towards the run."""
+        state = start_run_node({}, {"configurable": {"token_budget": 1000}})
+        budget = budget_for_run(state)
+        assert budget_for_run(state) is budget
+        budget.record_usage(AIMessage(content="", usage_metadata=usage(15)))
+        assert state["tokens_used"] == 0
+        assert run_tokens_used(state) == 15
+
+    def test_tracked_runs_bounded(self):
+        """Test that only the most recent runs keep their budget object."""
+        states = [start_run_node({}, {}) for _ in range(MAX_TRACKED_RUNS + 5)]
+        for state in states:
+            budget_for_run(state)
+        assert len(_run_budgets) == MAX_TRACKED_RUNS
+        assert states[0]["run_id"] not in _run_budgets
+        assert states[-1]["run_id"] in _run_budgets
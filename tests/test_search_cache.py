@@ -0,0 +1,257 @@
+"""
+Unit tests for the Tavily search cache (query normalization, TTL and deduplication).
+"""
+import pytest
+import hashlib
+import re
+import time
+
+
+SEARCH_STOPWORDS = {
+    "a", "an", "the", "of", "about", "on", "for", "in", "to", "and", "s",
+    "latest", "recent", "current", "today", "what", "is", "are", "me", "show", "find",
+}
+
+
+def normalize_query(query):
+    tokens = re.findall(r"[a-z0-9]+", query.lower())
+    kept = sorted(set(token for token in tokens if token not in SEARCH_STOPWORDS))
+    return " ".join(kept) if kept else " ".join(tokens)
+
+
+class TestQueryNormalization:
+    """Test normalization of search queries into cache keys."""
+
+    def test_equivalent_queries_share_key(self):
+        """Test that reordered queries with filler words normalize to the same key."""
+        assert normalize_query("Tesla stock news") == normalize_query("latest news Tesla stock")
+
+    def test_possessive_and_punctuation_ignored(self):
+        """Test that possessives and punctuation do not change the key."""
+        assert normalize_query("Tesla's stock news!") == normalize_query("tesla stock news")
+
+    def test_different_queries_differ(self):
+        """Test that queries about different companies get different keys."""
+        assert normalize_query("Tesla stock news") != normalize_query("Apple stock news")
+
+    def test_stopword_only_query_not_empty(self):
+        """Test that a query made only of stopwords still produces a key."""
+        assert normalize_query("what is the latest") != ""
+
+
+class TestSearchCache:
+    """Test TTL expiry, deduplication and snippet capping."""
+
+    def test_ttl_expiry(self):
+        """Test that cached responses expire after the TTL."""
+        entries = {}
+        ttl = 0.05
+
+        def put(key, value):
+            entries[key] = (time.monotonic() + ttl, value)
+
+        def get(key):
+            entry = entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                return entry[1]
+            entries.pop(key, None)
+            return None
+
+        put("news stock tesla", {"results": []})
+        assert get("news stock tesla") is not None
+        time.sleep(0.06)
+        assert get("news stock tesla") is None
+
+    def test_dedupe_by_url_and_content_hash(self):
+        """Test that results repeat on either URL or content across calls in a run."""
+        seen = set()
+
+        def filter_seen(results):
+            new, repeated = [], []
+            for result in results:
+                url = result.get("url", "")
+                digest = hashlib.sha1(" ".join(result.get("content", "").split()).encode()).hexdigest()
+                if url in seen or digest in seen:
+                    repeated.append(result)
+                    continue
+                seen.update(key for key in (url, digest) if key)
+                new.append(result)
+            return new, repeated
+
+        first = [{"url": "https://a.com", "content": "Tesla shares rose"}]
+        second = [
+            {"url": "https://a.com", "content": "different body"},          # same URL
+            {"url": "https://b.com", "content": "Tesla  shares rose"},      # same content
+            {"url": "https://c.com", "content": "New story"},
+        ]
+
+        new, repeated = filter_seen(first)
+        assert len(new) == 1 and not repeated
+
+        new, repeated = filter_seen(second)
+        assert [r["url"] for r in new] == ["https://c.com"]
+        assert len(repeated) == 2
+
+    def test_snippet_cap(self):
+        """Test that long snippets are trimmed on a word boundary."""
+        def cap_snippet(text, limit=500):
+            text = " ".join((text or "").split())
+            if len(text) <= limit:
+                return text
+            return text[:limit].rsplit(" ", 1)[0] + "..."
+
+        long_text = "word " * 300
+        capped = cap_snippet(long_text)
+        assert len(capped) <= 503
+        assert capped.endswith("...")
+        assert cap_snippet("short text") == "short text"
+
+
+def dedup_scope(config):
+    configurable = (config or {}).get("configurable", {})
+    namespace = configurable.get("checkpoint_ns")
+    if not namespace:
+        return None
+    return (configurable.get("thread_id", "default"), namespace.split("|", 1)[0])
+
+
+class SeenFilter:
+    """Copy of the notebook's SearchCache deduplication (without the response cache)."""
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._seen = {}
+
+    def filter_seen(self, scope, results):
+        if scope is None:
+            return list(results), []
+        new, repeated = [], []
+        now = time.monotonic()
+        for key in [key for key, (expires_at, _) in self._seen.items() if expires_at <= now]:
+            del self._seen[key]
+        seen = self._seen[scope][1] if scope in self._seen else set()
+        self._seen[scope] = (now + self.ttl, seen)
+        for result in results:
+            url = result.get("url", "")
+            digest = hashlib.sha1(" ".join(result.get("content", "").split()).encode()).hexdigest()
+            if url in seen or digest in seen:
+                repeated.append(result)
+                continue
+            seen.update(key for key in (url, digest) if key)
+            new.append(result)
+        return new, repeated
+
+
+RESULTS = [{"url": "https://a.com", "content": "Tesla shares rose"}]
+
+
+class TestDedupScope:
+    """Test that deduplication only spans a single agent run."""
+
+    def test_scope_from_checkpoint_namespace(self):
+        """Test that steps of one ReAct loop share a scope and separate runs do not."""
+        run = "WebSearchAgent:bcb71606-5a36-2c90-4fa6-3077771b6bd0"
+        first_step = {"configurable": {"thread_id": "1", "checkpoint_ns": f"{run}|tools:9695e874"}}
+        later_step = {"configurable": {"thread_id": "1", "checkpoint_ns": f"{run}|1|tools:d00d6fdb"}}
+        next_run = {"configurable": {"thread_id": "1", "checkpoint_ns": "WebSearchAgent:b6c9a198|tools:3297e685"}}
+        assert dedup_scope(first_step) == dedup_scope(later_step) == ("1", run)
+        assert dedup_scope(next_run) != dedup_scope(first_step)
+
+    def test_no_dedup_outside_a_graph_run(self):
+        """Test that direct tool calls always get full results."""
+        cache = SeenFilter()
+        assert dedup_scope({"configurable": {"thread_id": "1"}}) is None
+        assert dedup_scope(None) is None
+        for _ in range(2):
+            new, repeated = cache.filter_seen(None, RESULTS)
+            assert new == RESULTS and not repeated
+        assert not cache._seen
+
+    def test_later_run_gets_full_results(self):
+        """Test that results repeat within a run but not in the next run on the same thread."""
+        cache = SeenFilter()
+        assert cache.filter_seen(("1", "WebSearchAgent:a"), RESULTS) == (RESULTS, [])
+        assert cache.filter_seen(("1", "WebSearchAgent:a"), RESULTS) == ([], RESULTS)
+        assert cache.filter_seen(("1", "WebSearchAgent:b"), RESULTS) == (RESULTS, [])
+
+    def test_scopes_expire(self):
+        """Test that idle scopes are dropped once the TTL has passed."""
+        cache = SeenFilter(ttl=0.05)
+        for i in range(10):
+            cache.filter_seen((f"batch-{i}", "WebSearchAgent:a"), RESULTS)
+        assert len(cache._seen) == 10
+        time.sleep(0.06)
+        cache.filter_seen(("batch-next", "WebSearchAgent:a"), RESULTS)
+        assert list(cache._seen) == [("batch-next", "WebSearchAgent:a")]
+
+    def test_scope_per_node_invocation_in_graph(self):
+        """Test the scopes a tool sees when an agent subgraph runs twice per turn and over two turns."""
+        import operator
+        from typing import Annotated
+        from typing_extensions import TypedDict
+        from langchain_core.messages import AIMessage
+        from langchain_core.runnables import RunnableConfig
+        from langchain_core.tools import tool
+        from langgraph.checkpoint.memory import MemorySaver
+        from langgraph.graph import StateGraph, START, END
+        from langgraph.prebuilt import ToolNode
+
+        scopes = []
+
+        @tool
+        def search(query: str, config: RunnableConfig) -> str:
+            """Record the dedup scope of the call."""
+            scopes.append(dedup_scope(config))
+            return "ok"
+
+        class State(TypedDict):
+            messages: Annotated[list, operator.add]
+
+        def call(i):
+            return AIMessage(content="", tool_calls=[{"name": "search", "args": {"query": "Tesla"}, "id": str(i)}])
+
+        loop = StateGraph(State)
+        loop.add_node("tools", ToolNode([search]))
+        loop.add_edge(START, "tools")
+        loop.add_edge("tools", END)
+        agent = loop.compile()
+
+        def agent_node(state):
+            # Two tool steps within one ReAct loop
+            agent.invoke({"messages": [call(0)]})
+            agent.invoke({"messages": [call(1)]})
+            return {"messages": [AIMessage(content="answer", name="WebSearchAgent")]}
+
+        workflow = StateGraph(State)
+        workflow.add_node("WebSearchAgent", agent_node)
+        workflow.add_edge(START, "WebSearchAgent")
+        workflow.add_edge("WebSearchAgent", END)
+        graph = workflow.compile(checkpointer=MemorySaver())
+        for _ in range(2):
+            graph.invoke({"messages": []}, {"configurable": {"thread_id": "1"}})
+
+        assert scopes[0] == scopes[1]
+        assert scopes[2] == scopes[3]
+        assert scopes[0] != scopes[2]
+        assert all(scope[0] == "1" and scope[1].startswith("WebSearchAgent:") for scope in scopes)
+
+
+class TestSearchTimeout:
+    """Test that a slow Tavily call does not hold up the agent past its timeout."""
+
+    def test_slow_search_returns_message(self):
+        """Test that the tool answers with a timeout message instead of blocking."""
+        import concurrent.futures
+
+        def search(query, executor, timeout):
+            future = executor.submit(lambda: time.sleep(0.3) or {"results": []})
+            try:
+                return future.result(timeout=timeout)
+            except concurrent.futures.TimeoutError:
+                return f"Search for '{query}' timed out after {timeout:.0f}s; answer from what you have."
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            start = time.monotonic()
+            assert "timed out" in search("Tesla news", executor, timeout=0.05)
+            assert time.monotonic() - start < 0.2
+            assert search("Tesla news", executor, timeout=1) == {"results": []}
@@ -0,0 +1,143 @@
+"""
+Unit tests for the cache-friendly supervisor prompt and prompt-cache statistics.
+"""
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+
+SUPERVISOR_SYSTEM_PROMPT = (
+    "You are a highly efficient supervisor managing a collaborative conversation between specialized agents:"
+    "\n- FinancialAgent: {not a template variable}"
+    "\n\nBased on the conversation, who should act next? Choose one of: ['FINISH', 'FinancialAgent']"
+)
+
+supervisor_prompt = ChatPromptTemplate.from_messages(
+    [
+        SystemMessage(content=SUPERVISOR_SYSTEM_PROMPT),
+        MessagesPlaceholder(variable_name="messages"),
+    ]
+)
+
+
+def add_cache_control(messages):
+    prefix_end = 0
+    while prefix_end < len(messages) and messages[prefix_end].type == "system":
+        prefix_end += 1
+    if prefix_end == 0 or not isinstance(messages[prefix_end - 1].content, str):
+        return messages
+    last = messages[prefix_end - 1]
+    marked = last.model_copy(update={"content": [
+        {"type": "text", "text": last.content, "cache_control": {"type": "ephemeral"}}
+    ]})
+    return [*messages[:prefix_end - 1], marked, *messages[prefix_end:]]
+
+
+class PromptCacheStats:
+    """Copy of the notebook's prompt-cache statistics (without locking)."""
+
+    def __init__(self):
+        self.calls = 0
+        self.input_tokens = 0
+        self.cached_tokens = 0
+        self.cache_writes = 0
+        self.hit_calls = 0
+        self.hit_seconds = 0.0
+        self.miss_seconds = 0.0
+
+    def record(self, message, latency):
+        usage = getattr(message, "usage_metadata", None) or {}
+        details = usage.get("input_token_details") or {}
+        cached = details.get("cache_read") or 0
+        self.calls += 1
+        self.input_tokens += usage.get("input_tokens", 0)
+        self.cached_tokens += cached
+        self.cache_writes += details.get("cache_creation") or 0
+        if cached:
+            self.hit_calls += 1
+            self.hit_seconds += latency
+        else:
+            self.miss_seconds += latency
+
+    def stats(self):
+        miss_calls = self.calls - self.hit_calls
+        return {
+            "calls": self.calls,
+            "input_tokens": self.input_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cache_writes": self.cache_writes,
+            "cached_ratio": round(self.cached_tokens / self.input_tokens, 3) if self.input_tokens else None,
+            "avg_latency_hit": round(self.hit_seconds / self.hit_calls, 3) if self.hit_calls else None,
+            "avg_latency_miss": round(self.miss_seconds / miss_calls, 3) if miss_calls else None,
+        }
+
+
+def usage(input_tokens, cache_read=0, cache_creation=0):
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": 5,
+        "total_tokens": input_tokens + 5,
+        "input_token_details": {"cache_read": cache_read, "cache_creation": cache_creation},
+    }
+
+
+class TestSupervisorPrompt:
+    """Test that the supervisor prompt has a stable prefix."""
+
+    def test_prefix_identical_across_turns(self):
+        """Test that the system prefix does not change as the conversation grows."""
+        first = supervisor_prompt.invoke({"messages": [HumanMessage(content="Price of AAPL?")]}).to_messages()
+        second = supervisor_prompt.invoke({"messages": [
+            HumanMessage(content="Price of AAPL?"),
+            AIMessage(content="The last close was $278.28.", name="FinancialAgent"),
+        ]}).to_messages()
+        assert first[0].content == second[0].content == SUPERVISOR_SYSTEM_PROMPT
+
+    def test_conversation_is_the_tail(self):
+        """Test that no system message follows the conversation."""
+        messages = supervisor_prompt.invoke({"messages": [HumanMessage(content="Price of AAPL?")]}).to_messages()
+        assert [m.type for m in messages] == ["system", "human"]
+
+
+class TestCacheControl:
+    """Test marking the system prefix as a cache breakpoint."""
+
+    def test_marks_last_system_message(self):
+        """Test that the system message becomes a text block with cache_control."""
+        messages = [SystemMessage(content="rules"), HumanMessage(content="hi")]
+        marked = add_cache_control(messages)
+        assert marked[0].content == [{"type": "text", "text": "rules", "cache_control": {"type": "ephemeral"}}]
+        assert marked[1] is messages[1]
+        assert messages[0].content == "rules"  # original left untouched
+
+    def test_no_system_message(self):
+        """Test that messages without a system prefix are returned unchanged."""
+        messages = [HumanMessage(content="hi")]
+        assert add_cache_control(messages) is messages
+
+
+class TestPromptCacheStats:
+    """Test recording cached-token counts from responses."""
+
+    def test_cached_ratio_and_latency(self):
+        """Test that cache hits and misses are counted separately."""
+        stats = PromptCacheStats()
+        stats.record(AIMessage(content="", usage_metadata=usage(1200, cache_creation=1100)), 2.0)
+        stats.record(AIMessage(content="", usage_metadata=usage(1300, cache_read=1100)), 0.8)
+        stats.record(AIMessage(content="", usage_metadata=usage(1500, cache_read=1100)), 1.0)
+        result = stats.stats()
+        assert result["calls"] == 3
+        assert result["cached_tokens"] == 2200
+        assert result["cache_writes"] == 1100
+        assert result["cached_ratio"] == 0.55
+        assert result["avg_latency_hit"] == 0.9
+        assert result["avg_latency_miss"] == 2.0
+
+    def test_missing_usage(self):
+        """Test responses from providers that report no usage."""
+        stats = PromptCacheStats()
+        stats.record(AIMessage(content="FINISH"), 1.0)
+        result = stats.stats()
+        assert result["calls"] == 1
+        assert result["cached_ratio"] is None
+        assert result["avg_latency_hit"] is None
@@ -0,0 +1,158 @@
+"""
+Unit tests for the offline company name to ticker symbol index.
+"""
+import pytest
+import bisect
+import csv
+import os
+import re
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+NAME_SUFFIXES = {
+    "inc", "incorporated", "corp", "corporation", "co", "company", "companies", "ltd", "limited",
+    "plc", "sa", "se", "nv", "ag", "as", "class", "a", "b", "c", "and", "the", "com",
+}
+
+
+def normalize_name(text):
+    text = re.sub(r"['’]s\b", "", text.lower()).replace("&", " and ")
+    tokens = re.findall(r"[a-z0-9]+", text)
+    while tokens and tokens[-1] in NAME_SUFFIXES:
+        tokens.pop()
+    while tokens and tokens[0] == "the":
+        tokens.pop(0)
+    return " ".join(tokens)
+
+
+class TestNameNormalization:
+    """Test normalization of company names and queries."""
+
+    def test_strip_corporate_suffixes(self):
+        """Test that trailing corporate suffixes and share classes are removed."""
+        assert normalize_name("Apple Inc") == "apple"
+        assert normalize_name("Alphabet Inc - Class A") == "alphabet"
+        assert normalize_name("Deere & Co") == "deere"
+
+    def test_possessive_and_punctuation(self):
+        """Test that possessives and punctuation normalize consistently."""
+        assert normalize_name("McDonald's Corp") == normalize_name("McDonald's")
+        assert normalize_name("Tesla's") == "tesla"
+        assert normalize_name("Coca-Cola Co") == "coca cola"
+
+    def test_inner_words_kept(self):
+        """Test that suffix words are only stripped at the end."""
+        assert normalize_name("Bank of America Corp") == "bank of america"
+        assert normalize_name("Johnson & Johnson") == "johnson and johnson"
+
+
+class TestSymbolLookup:
+    """Test exact, prefix and fuzzy lookups."""
+
+    @pytest.fixture
+    def index(self):
+        names = {}
+        for symbol, name in [
+            ("AAPL", "Apple Inc"),
+            ("TSLA", "Tesla Inc"),
+            ("BAC", "Bank of America Corp"),
+            ("MSFT", "Microsoft Corporation"),
+            ("MU", "Micron Technology Inc"),
+            ("NVDA", "NVIDIA Corp"),
+        ]:
+            names.setdefault(normalize_name(name), []).append(symbol)
+        names.setdefault(normalize_name("Google"), []).append("GOOGL")
+        return names, sorted(names)
+
+    def _lookup(self, index, query):
+        import difflib
+        names, keys = index
+        key = normalize_name(query)
+        symbols = list(names.get(key, []))
+        start = bisect.bisect_left(keys, key)
+        prefixed = []
+        for candidate in keys[start:]:
+            if not candidate.startswith(key):
+                break
+            prefixed.append(candidate)
+        for candidate in sorted(prefixed, key=len):
+            symbols.extend(names[candidate])
+        if not symbols:
+            for candidate in difflib.get_close_matches(key, keys, cutoff=0.8):
+                symbols.extend(names[candidate])
+        return list(dict.fromkeys(symbols))
+
+    def test_exact_name(self, index):
+        """Test lookup by exact company name."""
+        assert self._lookup(index, "Tesla") == ["TSLA"]
+
+    def test_alias(self, index):
+        """Test lookup by alias."""
+        assert self._lookup(index, "Google") == ["GOOGL"]
+
+    def test_prefix(self, index):
+        """Test prefix lookup returns the shortest matching names first."""
+        assert self._lookup(index, "Bank of Ame") == ["BAC"]
+        assert self._lookup(index, "micro") == ["MSFT", "MU"]
+
+    def test_fuzzy_fallback(self, index):
+        """Test fuzzy matching of a misspelled name."""
+        assert self._lookup(index, "Nvida") == ["NVDA"]
+
+    def test_no_match(self, index):
+        """Test lookup with no match."""
+        assert self._lookup(index, "zzzz") == []
+
+
+class TestBundledListing:
+    """Test the bundled listing and alias files."""
+
+    def _read(self, filename):
+        with open(os.path.join(DATA_DIR, filename), newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+
+    def test_listing_columns(self):
+        """Test that the listing uses the LISTING_STATUS column names."""
+        rows = self._read("listing_status.csv")
+        assert rows
+        assert list(rows[0].keys()) == ["symbol", "name", "exchange", "assetType"]
+
+    def test_listing_symbols_unique(self):
+        """Test that each symbol appears once."""
+        symbols = [row["symbol"] for row in self._read("listing_status.csv")]
+        assert len(symbols) == len(set(symbols))
+
+    def test_aliases_point_to_listed_symbols(self):
+        """Test that every alias refers to a symbol in the listing."""
+        symbols = {row["symbol"] for row in self._read("listing_status.csv")}
+        for row in self._read("symbol_aliases.csv"):
+            assert row["symbol"] in symbols, f"Alias {row['alias']} points to unlisted {row['symbol']}"
+
+
+FULL_LISTING_MIN_ROWS = 5000
+
+
+def lookup_miss_message(company, listed_count):
+    if listed_count < FULL_LISTING_MIN_ROWS:
+        return (
+            f"'{company}' is not in the local symbol index, which only covers {listed_count} "
+            "common stocks and ETFs. Use the ticker symbol you know for this company."
+        )
+    return f"No ticker symbol found for '{company}'."
+
+
+class TestLookupMiss:
+    """Test what the lookup tool tells the agent when a company is not found."""
+
+    def test_subset_miss_tells_agent_to_fall_back(self):
+        """Test that a miss on the bundled subset says the index is incomplete."""
+        with open(os.path.join(DATA_DIR, "listing_status.csv"), newline="", encoding="utf-8") as f:
+            listed_count = len(list(csv.DictReader(f)))
+        message = lookup_miss_message("Roku", listed_count)
+        assert "only covers" in message
+        assert "ticker symbol you know" in message
+
+    def test_full_listing_miss(self):
+        """Test that a miss on a full listing reports no symbol."""
+        assert lookup_miss_message("Roku", 12000) == "No ticker symbol found for 'Roku'."